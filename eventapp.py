@@ -1,15 +1,24 @@
+import os
+import tempfile
 import streamlit as st
+from functools import reduce
+from math import gcd
 import pandas as pd
-import folium
-from streamlit_folium import st_folium
+import numpy as np
 import plotly.express as px
+from numba import njit
+import streamlit.components.v1 as components
+
+st.set_page_config(page_title="Chicago Events Analyzer", layout="wide")
 
 # -----------------------------
 # Load Data
 # -----------------------------
-@st.cache_data
-def load_data():
-    df = pd.read_csv("events.csv")
+# Bump when clean_events() changes so an older events.parquet cache is never reused
+SCHEMA_VERSION = 1
+PARQUET_CACHE = f"events.v{SCHEMA_VERSION}.parquet"
+
+def clean_events(df):
     # Clean numeric columns
     df["Attendance"] = pd.to_numeric(df["Attendance"].astype(str).str.replace(",",""), errors="coerce")
     df["Estimated_Sponsorship_Cost"] = pd.to_numeric(df["Estimated_Sponsorship_Cost"].astype(str).str.replace(",",""), errors="coerce")
@@ -18,11 +27,204 @@ def load_data():
     df["Publicity_Score"] = pd.to_numeric(df["Publicity_Score"], errors="coerce")
     df["PrideFactor"] = pd.to_numeric(df["PrideFactor"], errors="coerce")
     df["FitScore"] = pd.to_numeric(df["FitScore"], errors="coerce")
+    # Categorical dtypes so filters and counts work on integer codes
+    for col in ("Month", "Season", "Category", "Free_or_Ticketed", "Demographic"):
+        df[col] = df[col].astype("category")
+    return df
+
+@st.cache_data
+def load_data():
+    # events.csv is the source of truth; the Parquet file is an untracked local cache,
+    # rebuilt whenever it is missing or older than the CSV
+    if os.path.exists(PARQUET_CACHE) and os.path.getmtime(PARQUET_CACHE) >= os.path.getmtime("events.csv"):
+        return pd.read_parquet(PARQUET_CACHE)
+    df = clean_events(pd.read_csv("events.csv"))
+    try:
+        fd, tmp = tempfile.mkstemp(dir=".", prefix="events.", suffix=".parquet")
+    except OSError:
+        return df  # read-only deployment: serve the freshly parsed CSV
+    # Write to a private temp file and swap it in, so neither a crash nor a
+    # concurrent cold start can expose a partially written cache
+    try:
+        with os.fdopen(fd, "wb") as f:
+            df.to_parquet(f, compression="zstd", index=False)
+        os.replace(tmp, PARQUET_CACHE)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
     return df
 
 df = load_data()
 
-st.set_page_config(page_title="Chicago Events Analyzer", layout="wide")
+# -----------------------------
+# Knapsack Solver
+# -----------------------------
+@njit(cache=True, boundscheck=False)
+def knapsack(costs, values, W):
+    # 0/1 knapsack over a 1-D rolling array; taken[i, w] marks item i chosen at capacity w
+    dp = np.zeros(W+1)
+    taken = np.zeros((costs.size, W+1), np.bool_)
+    for i in range(costs.size):
+        c = costs[i]
+        v = values[i]
+        for w in range(W, c-1, -1):
+            cand = dp[w-c] + v
+            if cand > dp[w]:
+                dp[w] = cand
+                taken[i, w] = True
+    return dp, taken
+
+@st.cache_data(show_spinner=False)
+def solve_knapsack(costs, values, W):
+    # Nothing to choose, or everything fits: the optimum takes every positive-value item
+    if not costs:
+        return []
+    if sum(costs) <= W:
+        return [i for i, v in enumerate(values) if v > 0]
+    # Costs are usually round dollar amounts: divide out their common factor to shrink W
+    g = reduce(gcd, costs, W)
+    if g > 1:
+        costs = tuple(c // g for c in costs)
+        W //= g
+    _, taken = knapsack(np.asarray(costs, dtype=np.int64), np.asarray(values, dtype=np.float64), W)
+    # Backtrack
+    w = W
+    selected_indices = []
+    for i in range(len(costs)-1,-1,-1):
+        if taken[i, w]:
+            selected_indices.append(i)
+            w -= costs[i]
+    return selected_indices
+
+# -----------------------------
+# Filtering & Scoring
+# -----------------------------
+demo_scores = {"Families": 1.0, "Young Adults": 0.9, "Sports Fans": 0.8, "Cultural Communities": 0.7, "General Public": 0.8}
+
+@njit(fastmath={"contract"}, error_model="numpy", cache=True)
+def score_kernel(att, pub, pride, media, demo, cost, w):
+    # w = (attendance, publicity, pride, media, cost, demo) weights; one fused pass per event
+    n = att.size
+    norm_att = np.empty(n)
+    norm_cost = np.empty(n)
+    fit = np.empty(n)
+    roi = np.empty(n)
+    if n == 0:
+        return norm_att, norm_cost, fit, roi
+    # Clamp denominators so a zero max/cost cannot produce inf/NaN scores
+    inv_max_att = 1.0 / max(np.nanmax(att), 1e-9)
+    inv_max_cost = 1.0 / max(np.nanmax(cost), 1e-9)
+    for i in range(n):
+        norm_att[i] = att[i] * inv_max_att
+        norm_cost[i] = cost[i] * inv_max_cost
+        fit[i] = (
+            w[0] * norm_att[i] +
+            w[1] * pub[i] * 0.1 +
+            w[2] * pride[i] * 0.1 +
+            w[3] * media[i] * 0.1 +
+            w[5] * demo[i] -
+            w[4] * norm_cost[i]
+        )
+        roi[i] = (att[i] * pub[i] * media[i]) / max(cost[i], 1e-9)
+    return norm_att, norm_cost, fit, roi
+
+@st.cache_data(show_spinner=False)
+def compute_scores(df, months, seasons, categories, tickets, cost_adjustment, weights):
+    # Apply filters (combine masks in NumPy, then index once)
+    mask = (
+        df["Month"].isin(months).values &
+        df["Season"].isin(seasons).values &
+        df["Category"].isin(categories).values &
+        df["Free_or_Ticketed"].isin(tickets).values
+    )
+    filtered_df = df.loc[mask]
+
+    # FitScore & ROI Calculations
+    adjusted_cost = filtered_df["Estimated_Sponsorship_Cost"].to_numpy(np.float64) * cost_adjustment
+    # DemoScore via a lookup table indexed by category code; the trailing 0.6 is hit by code -1 (missing)
+    demo_lut = np.array([demo_scores.get(c, 0.6) for c in df["Demographic"].cat.categories] + [0.6])
+    demo_score = demo_lut[filtered_df["Demographic"].cat.codes.to_numpy()]
+    norm_att, norm_cost, fit, roi = score_kernel(
+        filtered_df["Attendance"].to_numpy(np.float64),
+        filtered_df["Publicity_Score"].to_numpy(np.float64),
+        filtered_df["PrideFactor"].to_numpy(np.float64),
+        filtered_df["FitScore"].to_numpy(np.float64),
+        demo_score,
+        adjusted_cost,
+        tuple(float(w) for w in weights),
+    )
+    return filtered_df.assign(
+        AdjustedCost=adjusted_cost,
+        NormAttendance=norm_att,
+        NormCost=norm_cost,
+        DemoScore=demo_score,
+        DynamicFitScore=fit,
+        ROI=np.round(roi, 2),
+    )
+
+# Kept cached: formatting every cell as text costs far more than hashing the frame
+@st.cache_data(show_spinner=False)
+def to_csv_bytes(df):
+    return df.to_csv(index=False).encode("utf-8")
+
+def get_counts(df):
+    # Per-column event counts for the charts (zero-count categories dropped); not cached,
+    # since hashing the filtered frame would cost as much as three value_counts() calls
+    return {
+        col: df[col].value_counts().loc[lambda s: s > 0].rename_axis(col).reset_index(name="Count")
+        for col in ("Category", "Season", "Demographic")
+    }
+
+def get_filter_options(df):
+    # The filter columns are categoricals, so the options are just their (non-null) categories;
+    # this is cheaper than hashing df for st.cache_data on every rerun
+    return {
+        "months": tuple(sorted(df["Month"].cat.categories)),
+        "seasons": tuple(sorted(df["Season"].cat.categories)),
+        "categories": tuple(sorted(df["Category"].cat.categories)),
+        "tickets": tuple(sorted(df["Free_or_Ticketed"].cat.categories)),
+    }
+
+# -----------------------------
+# Map
+# -----------------------------
+# Leaflet callback for FastMarkerCluster rows: [lat, lon, popup_html, tooltip]
+marker_callback = """
+function (row) {
+    var icon = L.AwesomeMarkers.icon({icon: "info-sign", markerColor: "red", prefix: "glyphicon"});
+    var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icon});
+    marker.bindPopup(row[2]);
+    marker.bindTooltip(row[3]);
+    return marker;
+}
+"""
+
+@st.cache_data(show_spinner=False)
+def build_map_html(map_df):
+    # Imported here so cache hits never load folium
+    import folium
+    from folium.plugins import FastMarkerCluster
+
+    popups = (
+        "<b>" + map_df["Event"].astype(str) + "</b><br>"
+        "Category: " + map_df["Category"].astype(str) + "<br>"
+        "Demographic: " + map_df["Demographic"].astype(str) + "<br>"
+        "Attendance: " + map_df["Attendance"].map("{:,}".format).astype(str) + "<br>"
+        "Sponsorship Cost: $" + map_df["AdjustedCost"].map("{:,}".format).astype(str) + "<br>"
+        "Publicity: " + map_df["Publicity_Score"].astype(str) + "<br>"
+        "Pride: " + map_df["PrideFactor"].astype(str) + "<br>"
+        "FitScore: " + map_df["FitScore"].astype(str) + "<br>"
+        "DemoScore: " + map_df["DemoScore"].map("{:.2f}".format).astype(str) + "<br>"
+        "DynamicFitScore: " + map_df["DynamicFitScore"].map("{:.2f}".format).astype(str) + "<br>"
+        "ROI: " + map_df["ROI"].astype(str)
+    )
+    m = folium.Map(location=[41.8781, -87.6298], zoom_start=11)
+    FastMarkerCluster(
+        data=list(zip(map_df["Latitude"].tolist(), map_df["Longitude"].tolist(), popups.tolist(), map_df["Event"].tolist())),
+        callback=marker_callback,
+    ).add_to(m)
+    return m.get_root().render()
+
 st.title("Chicago Events Analyzer for Local Style Potato Chips")
 st.markdown(
     "This app evaluates Chicago events for Local Style Potato Chips marketing opportunities. "
@@ -33,41 +235,33 @@ st.markdown(
 # Sidebar Filters
 # -----------------------------
 st.sidebar.header("Filters")
+filter_options = get_filter_options(df)
 month_filter = st.sidebar.multiselect(
     "Select Month(s):",
-    options=df["Month"].unique(),
-    default=df["Month"].unique()
+    options=filter_options["months"],
+    default=filter_options["months"]
 )
 season_filter = st.sidebar.multiselect(
     "Select Season(s):",
-    options=df["Season"].unique(),
-    default=df["Season"].unique()
+    options=filter_options["seasons"],
+    default=filter_options["seasons"]
 )
 category_filter = st.sidebar.multiselect(
     "Select Category(ies):",
-    options=df["Category"].unique(),
-    default=df["Category"].unique()
+    options=filter_options["categories"],
+    default=filter_options["categories"]
 )
 ticket_filter = st.sidebar.multiselect(
     "Free or Ticketed:",
-    options=df["Free_or_Ticketed"].unique(),
-    default=df["Free_or_Ticketed"].unique()
+    options=filter_options["tickets"],
+    default=filter_options["tickets"]
 )
 
-# Apply filters
-filtered_df = df[
-    df["Month"].isin(month_filter) &
-    df["Season"].isin(season_filter) &
-    df["Category"].isin(category_filter) &
-    df["Free_or_Ticketed"].isin(ticket_filter)
-]
-
 # -----------------------------
 # Cost Adjustments & Budget
 # -----------------------------
 st.sidebar.header("Budget & Cost Adjustment")
 cost_adjustment = st.sidebar.number_input("Cost Adjustment Multiplier", min_value=0.1, max_value=3.0, value=1.0, step=0.1)
-filtered_df["AdjustedCost"] = filtered_df["Estimated_Sponsorship_Cost"] * cost_adjustment
 budget = st.sidebar.number_input("Total Marketing Budget ($)", min_value=0, value=50000, step=1000)
 
 # -----------------------------
@@ -81,22 +275,15 @@ media_w = st.sidebar.slider("Weight: Media Coverage", 0.0, 1.0, 0.2)
 cost_w = st.sidebar.slider("Weight: Sponsorship Cost (penalty)", 0.0, 1.0, 0.1)
 demo_w = st.sidebar.slider("Weight: Demographics Alignment", 0.0, 1.0, 0.1)
 
-# -----------------------------
-# FitScore & ROI Calculations
-# -----------------------------
-filtered_df["NormAttendance"] = filtered_df["Attendance"] / filtered_df["Attendance"].max()
-filtered_df["NormCost"] = filtered_df["AdjustedCost"] / filtered_df["AdjustedCost"].max()
-demo_scores = {"Families": 1.0, "Young Adults": 0.9, "Sports Fans": 0.8, "Cultural Communities": 0.7, "General Public": 0.8}
-filtered_df["DemoScore"] = filtered_df["Demographic"].map(demo_scores).fillna(0.6)
-filtered_df["DynamicFitScore"] = (
-    attendance_w * filtered_df["NormAttendance"] +
-    publicity_w * (filtered_df["Publicity_Score"] / 10) +
-    pride_w * (filtered_df["PrideFactor"] / 10) +
-    media_w * (filtered_df["FitScore"] / 10) +
-    demo_w * filtered_df["DemoScore"] -
-    cost_w * filtered_df["NormCost"]
+filtered_df = compute_scores(
+    df,
+    tuple(sorted(month_filter)),
+    tuple(sorted(season_filter)),
+    tuple(sorted(category_filter)),
+    tuple(sorted(ticket_filter)),
+    cost_adjustment,
+    (attendance_w, publicity_w, pride_w, media_w, cost_w, demo_w),
 )
-filtered_df["ROI"] = ((filtered_df["Attendance"] * filtered_df["Publicity_Score"] * filtered_df["FitScore"]) / filtered_df["AdjustedCost"]).round(2)
 
 # -----------------------------
 # Tabs
@@ -114,27 +301,25 @@ with tab1:
             "Publicity_Score","PrideFactor","FitScore","DemoScore","DynamicFitScore","ROI","Free_or_Ticketed","Location"
         ]].sort_values(by="DynamicFitScore", ascending=False)
     )
-    csv_export = filtered_df.to_csv(index=False).encode("utf-8")
+    csv_export = to_csv_bytes(filtered_df)
     st.download_button("Download Filtered Data as CSV", csv_export, "filtered_events.csv", "text/csv")
 
 # -----------------------------
 # Tab 2: Visualizations
 # -----------------------------
 with tab2:
+    counts = get_counts(filtered_df)
+
     st.subheader("Event Category Breakdown")
-    fig_pie = px.pie(filtered_df, names="Category")
+    fig_pie = px.pie(counts["Category"], names="Category", values="Count")
     st.plotly_chart(fig_pie, use_container_width=True)
 
     st.subheader("Seasonal Event Counts")
-    season_counts = filtered_df["Season"].value_counts().reset_index()
-    season_counts.columns = ["Season","Count"]
-    fig_season = px.bar(season_counts, x="Season", y="Count", color="Season")
+    fig_season = px.bar(counts["Season"], x="Season", y="Count", color="Season")
     st.plotly_chart(fig_season, use_container_width=True)
 
     st.subheader("Demographic Breakdown")
-    demo_counts = filtered_df["Demographic"].value_counts().reset_index()
-    demo_counts.columns = ["Demographic","Count"]
-    fig_demo = px.bar(demo_counts, x="Demographic", y="Count", color="Demographic")
+    fig_demo = px.bar(counts["Demographic"], x="Demographic", y="Count", color="Demographic")
     st.plotly_chart(fig_demo, use_container_width=True)
 
 # -----------------------------
@@ -145,28 +330,7 @@ with tab3:
     map_df = filtered_df.dropna(subset=["Latitude", "Longitude"])
     if len(map_df) < len(filtered_df):
         st.warning(f"{len(filtered_df) - len(map_df)} events have missing coordinates and will not appear on the map.")
-    m = folium.Map(location=[41.8781, -87.6298], zoom_start=11)
-    for _, row in map_df.iterrows():
-        popup_text = (
-            f"<b>{row['Event']}</b><br>"
-            f"Category: {row['Category']}<br>"
-            f"Demographic: {row['Demographic']}<br>"
-            f"Attendance: {row['Attendance']:,}<br>"
-            f"Sponsorship Cost: ${row['AdjustedCost']:,}<br>"
-            f"Publicity: {row['Publicity_Score']}<br>"
-            f"Pride: {row['PrideFactor']}<br>"
-            f"FitScore: {row['FitScore']}<br>"
-            f"DemoScore: {row['DemoScore']:.2f}<br>"
-            f"DynamicFitScore: {row['DynamicFitScore']:.2f}<br>"
-            f"ROI: {row['ROI']}"
-        )
-        folium.Marker(
-            location=[row["Latitude"], row["Longitude"]],
-            popup=popup_text,
-            tooltip=row["Event"],
-            icon=folium.Icon(color="red", icon="info-sign")  # Pinpoint style
-        ).add_to(m)
-    st_folium(m, width=900, height=600)
+    components.html(build_map_html(map_df), width=900, height=600)
 
 # -----------------------------
 # Tab 4: Info
@@ -196,39 +360,34 @@ with tab5:
         if budget_df.empty:
             st.warning("No events fit within the total budget.")
         else:
-            budget_df["NormFitScore"] = budget_df["DynamicFitScore"] / budget_df["DynamicFitScore"].max()
-            budget_df["NormROI"] = budget_df["ROI"] / budget_df["ROI"].max()
+            # DynamicFitScore can be negative (cost penalty), so only fall back when the max is not positive
+            fit_max = budget_df["DynamicFitScore"].max()
+            if not fit_max > 0:
+                fit_max = 1.0
+            roi_max = budget_df["ROI"].max()
+            if not roi_max > 0:
+                roi_max = 1.0
+            budget_df["NormFitScore"] = budget_df["DynamicFitScore"] / fit_max
+            budget_df["NormROI"] = budget_df["ROI"] / roi_max
             budget_df["CombinedScore"] = (budget_df["NormFitScore"] + budget_df["NormROI"]) / 2
 
             events = budget_df.to_dict('records')
-            n = len(events)
             W = int(budget)
             costs = [int(e["AdjustedCost"]) for e in events]
             values = [e["CombinedScore"] for e in events]
 
             # Knapsack DP
-            dp = [[0]*(W+1) for _ in range(n+1)]
-            for i in range(1,n+1):
-                for w in range(W+1):
-                    if costs[i-1] <= w:
-                        dp[i][w] = max(dp[i-1][w], dp[i-1][w-costs[i-1]] + values[i-1])
-                    else:
-                        dp[i][w] = dp[i-1][w]
-
-            # Backtrack
-            w = W
-            selected_indices = []
-            for i in range(n,0,-1):
-                if dp[i][w] != dp[i-1][w]:
-                    selected_indices.append(i-1)
-                    w -= costs[i-1]
-
-            recommended_events = [events[i] for i in selected_indices]
-            recommended_df = pd.DataFrame(recommended_events).sort_values(by="CombinedScore", ascending=False)
-            st.dataframe(recommended_df[[
-                "Event","Month","Season","Category","Demographic","Attendance",
-                "AdjustedCost","DynamicFitScore","ROI","CombinedScore"
-            ]])
-
-            csv_export = recommended_df.to_csv(index=False).encode("utf-8")
-            st.download_button("Download Optimized Events CSV", csv_export, "optimized_events.csv", "text/csv")
+            selected_indices = solve_knapsack(tuple(costs), tuple(values), W)
+
+            if not selected_indices:
+                st.warning("No events selected within the total budget.")
+            else:
+                recommended_events = [events[i] for i in selected_indices]
+                recommended_df = pd.DataFrame(recommended_events).sort_values(by="CombinedScore", ascending=False)
+                st.dataframe(recommended_df[[
+                    "Event","Month","Season","Category","Demographic","Attendance",
+                    "AdjustedCost","DynamicFitScore","ROI","CombinedScore"
+                ]])
+
+                csv_export = to_csv_bytes(recommended_df)
+                st.download_button("Download Optimized Events CSV", csv_export, "optimized_events.csv", "text/csv")